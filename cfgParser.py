@@ -1,34 +1,110 @@
 import re
 import os
+import sys
+import functools
+from array import array
+from collections import deque
 import subprocess
 import tempfile
 from graphviz import Digraph
 
+# Characters allowed as terminals: lowercase letters, digits, and common
+# special characters used in grammars
+_TERM_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789+-*/(){}[]:;.,><=!")
+
+# Characters allowed as variables: uppercase letters
+_VAR_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# Characters allowed anywhere in a production body: variables and terminals
+_SYMBOL_CHARS = _TERM_CHARS | _VAR_CHARS
+
+# Body of an epsilon production
+_EPSILON = ('epsilon',)
+
+# Section headers of a grammar file and the section each one starts
+_HEADERS = {
+    'VARIABLES': 'variables',
+    'TERMINALS': 'terminals',
+    'PRODUCTIONS': 'productions',
+    'START': 'start',
+}
+
+# Splits a string into its leading a's and trailing b's
+_ANBN_RE = re.compile(r'(a*)(b*)')
+
+# Preformatted DOT attributes for parse tree nodes
+_VAR_NODE_ATTRS = 'fillcolor=lightblue shape=circle style=filled'
+_TERM_NODE_ATTRS = 'fillcolor=lightgrey shape=box style=filled'
+
 class CFG:
-    def __init__(self):
+    def __init__(self, memoize=False):
         self.variables = set()
         self.terminals = set()
         self.productions = {}
         self.start_symbol = None
+        self._cnf = None
+        self._is_anbn = None
+        self._tables = None
+        self._fill = None
+        # Optionally memoize recognition results per input string; the cache
+        # is cleared whenever the grammar changes
+        self._recognize = self._cyk
+        if memoize:
+            self._recognize = functools.lru_cache(maxsize=4096)(self._cyk)
+        # CYK tables for recent input strings, so checking a string and then
+        # deriving it fills its table only once
+        self._table_for = functools.lru_cache(maxsize=8)(self._cyk_table)
+        # Expanders for recent input strings, so the leftmost and rightmost
+        # derivations and the parse tree of a string share one CYK table and
+        # one set of span memos
+        self._expander_for = functools.lru_cache(maxsize=8)(self._expander)
+
+    def _invalidate(self):
+        self._cnf = None
+        self._is_anbn = None
+        self._tables = None
+        self._fill = None
+        if hasattr(self._recognize, 'cache_clear'):
+            self._recognize.cache_clear()
+        self._table_for.cache_clear()
+        self._expander_for.cache_clear()
 
+    @property
+    def is_anbn(self):
+        """
+        Whether this is the a^n b^n grammar (S -> a S b | epsilon), computed
+        once and cached until the grammar is modified.
+        """
+        if self._is_anbn is None:
+            self._is_anbn = False
+            if self.start_symbol == 'S' and len(self.productions.get('S', [])) == 2:
+                prods = self.productions['S']
+                if _EPSILON in prods and ('a', 'S', 'b') in prods:
+                    self._is_anbn = True
+        return self._is_anbn
+
+    # Strings longer than one character are never in the character sets, so
+    # membership alone checks both length and class
     def validate_variable(self, var):
-        return bool(re.match(r'^[A-Z]$', var))
+        return var in _VAR_CHARS
 
     def validate_terminal(self, term):
-        # Allow lowercase letters, digits, and common special characters used in grammars
-        return bool(re.match(r'^[a-z0-9\+\-\*\/\(\)\{\}\[\]\:\;\.\,\>\<\=\!]$', term))
+        return term in _TERM_CHARS
 
     def validate_production(self, head, body):
         if not self.validate_variable(head):
             return False
+        # A single set lookup per symbol; strings longer than one character
+        # are never in the set
         for symbol in body:
-            if symbol != 'epsilon' and not (self.validate_variable(symbol) or self.validate_terminal(symbol)):
+            if symbol not in _SYMBOL_CHARS and symbol != 'epsilon':
                 return False
         return True
 
     def add_variable(self, var):
         if self.validate_variable(var):
             self.variables.add(var)
+            self._invalidate()
             if var not in self.productions:
                 self.productions[var] = []
             return True
@@ -37,6 +113,7 @@ class CFG:
     def add_terminal(self, term):
         if self.validate_terminal(term):
             self.terminals.add(term)
+            self._invalidate()
             return True
         return False
 
@@ -44,36 +121,34 @@ class CFG:
         if self.validate_production(head, body):
             if head not in self.productions:
                 self.productions[head] = []
-            self.productions[head].append(body)
+            # Bodies are stored as tuples of interned symbols; every epsilon
+            # body is the shared _EPSILON, so it can be tested by identity
+            body = tuple(map(sys.intern, body))
+            self.productions[head].append(_EPSILON if body == _EPSILON else body)
+            self._invalidate()
             return True
         return False
 
     def set_start_symbol(self, symbol):
         if self.validate_variable(symbol) and symbol in self.variables:
             self.start_symbol = symbol
+            self._invalidate()
             return True
         return False
 
     def load_from_file(self, filename):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            # Read through a 64 KiB buffer; lines are consumed as they are
+            # read, with blank and comment lines dropped before dispatching
+            # on sections
+            with open(filename, 'r', encoding='utf-8', buffering=65536) as f:
                 section = None
-                for line in lines:
-                    line = line.strip()
+                for line in map(str.strip, f):
                     if not line or line.startswith('#'):
                         continue
-                    if line == 'VARIABLES':
-                        section = 'variables'
-                        continue
-                    elif line == 'TERMINALS':
-                        section = 'terminals'
-                        continue
-                    elif line == 'PRODUCTIONS':
-                        section = 'productions'
-                        continue
-                    elif line == 'START':
-                        section = 'start'
+                    header = _HEADERS.get(line)
+                    if header is not None:
+                        section = header
                         continue
 
                     if section == 'variables':
@@ -85,12 +160,12 @@ class CFG:
                             print(f"Invalid terminal: {line}")
                             return False
                     elif section == 'productions':
-                        parts = line.split('->')
-                        if len(parts) != 2:
+                        head, sep, body_part = line.partition('->')
+                        if not sep:
                             print(f"Invalid production format: {line}")
                             return False
-                        head = parts[0].strip()
-                        bodies = parts[1].strip().split('|')
+                        head = head.strip()
+                        bodies = body_part.strip().split('|')
                         for body in bodies:
                             body_symbols = body.strip().split() or ['epsilon']
                             if not self.add_production(head, body_symbols):
@@ -103,6 +178,7 @@ class CFG:
             if not self.variables or not self.terminals or not self.productions or not self.start_symbol:
                 print("Incomplete grammar: Missing variables, terminals, productions, or start symbol")
                 return False
+            self._derivation_tables()
             return True
         except FileNotFoundError:
             print(f"File {filename} not found")
@@ -112,9 +188,13 @@ class CFG:
             return False
 
     def load_from_console(self):
+        # Piped input is read straight from stdin, without the flushing and
+        # tty handling input() does per line; reading line by line leaves
+        # the rest of the input for the prompts that follow
+        read_line = input if sys.stdin.isatty() else sys.stdin.readline
         print("Enter variables (one per line, uppercase letters, empty line to end):")
         while True:
-            var = input().strip()
+            var = read_line().strip()
             if not var:
                 break
             if not self.add_variable(var):
@@ -123,7 +203,7 @@ class CFG:
 
         print("Enter terminals (one per line, lowercase letters or digits, empty line to end):")
         while True:
-            term = input().strip()
+            term = read_line().strip()
             if not term:
                 break
             if not self.add_terminal(term):
@@ -132,15 +212,15 @@ class CFG:
 
         print("Enter productions (format: A -> B C | epsilon, one per line, empty line to end):")
         while True:
-            prod = input().strip()
+            prod = read_line().strip()
             if not prod:
                 break
-            parts = prod.split('->')
-            if len(parts) != 2:
+            head, sep, body_part = prod.partition('->')
+            if not sep:
                 print(f"Invalid production format: {prod}")
                 return False
-            head = parts[0].strip()
-            bodies = parts[1].strip().split('|')
+            head = head.strip()
+            bodies = body_part.strip().split('|')
             for body in bodies:
                 body_symbols = body.strip().split() or ['epsilon']
                 if not self.add_production(head, body_symbols):
@@ -148,7 +228,7 @@ class CFG:
                     return False
 
         print("Enter start symbol (single uppercase letter):")
-        start = input().strip()
+        start = read_line().strip()
         if not self.set_start_symbol(start):
             print(f"Invalid start symbol: {start}")
             return False
@@ -156,6 +236,7 @@ class CFG:
         if not self.variables or not self.terminals or not self.productions or not self.start_symbol:
             print("Incomplete grammar: Missing variables, terminals, productions, or start symbol")
             return False
+        self._derivation_tables()
         return True
 
     def display(self):
@@ -164,112 +245,403 @@ class CFG:
         print("Productions:")
         for head, bodies in self.productions.items():
             for body in bodies:
-                print(f"{head} -> {' '.join(body) if body != ['epsilon'] else 'epsilon'}")
+                print(f"{head} -> {' '.join(body) if body is not _EPSILON else 'epsilon'}")
         print("Start Symbol:", self.start_symbol)
 
+    def _to_cnf(self):
+        """
+        Convert the grammar to Chomsky Normal Form for the CYK recognizer.
+        Returns (unary, binary, nullable, bits) where bits maps each variable
+        to its own bit so sets of variables can be held in int bitsets.
+        unary maps a terminal t to the bitset of variables A with A -> t.
+        binary lists, for each variable B, a triple (bit of B, bitset of the
+        Cs in rules A -> B C, pairs) where pairs holds (bit of C, bitset of
+        the A with A -> B C). nullable is the set of variables deriving
+        epsilon.
+
+        The result is cached on the object until the grammar is modified.
+        """
+        if self._cnf is not None:
+            return self._cnf
+
+        # Replace terminals inside long bodies and binarize; helper variables
+        # get multi-character names so they never clash with user variables
+        rules = {}
+        # Helper variable for each (left, symbol) pair, i.e. for each distinct
+        # body prefix, shared by every production that starts with it
+        prefixes = {}
+        for head, bodies in self.productions.items():
+            rules.setdefault(head, [])
+            for body in bodies:
+                if body is _EPSILON:
+                    rules[head].append(())
+                    continue
+                symbols = list(body)
+                if len(symbols) > 1:
+                    for i, symbol in enumerate(symbols):
+                        if not self.validate_variable(symbol):
+                            term_var = f"<{symbol}>"
+                            rules[term_var] = [(symbol,)]
+                            symbols[i] = term_var
+                # Binarize from the left so productions with a common prefix
+                # (A -> a B C | a B D) are factored through one helper
+                left = symbols[0]
+                for symbol in symbols[1:-1]:
+                    pair = (left, symbol)
+                    helper = prefixes.get(pair)
+                    if helper is None:
+                        helper = prefixes[pair] = f"<#{len(prefixes)}>"
+                        rules[helper] = [pair]
+                    left = helper
+                rules[head].append((left, symbols[-1]) if len(symbols) > 1 else (left,))
+
+        # Compute nullable variables by fixed point
+        nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for head, bodies in rules.items():
+                if head not in nullable and any(all(s in nullable for s in body) for body in bodies):
+                    nullable.add(head)
+                    changed = True
+
+        # Eliminate epsilon productions
+        for head, bodies in rules.items():
+            new_bodies = set()
+            for body in bodies:
+                if len(body) == 2:
+                    new_bodies.add(body)
+                    if body[0] in nullable:
+                        new_bodies.add(body[1:])
+                    if body[1] in nullable:
+                        new_bodies.add(body[:1])
+                elif body:
+                    new_bodies.add(body)
+            rules[head] = new_bodies
+
+        # Eliminate unit productions A -> B by inlining everything B reaches
+        unary = {}
+        binary = {}
+        for head in rules:
+            reach = {head}
+            stack = [head]
+            while stack:
+                var = stack.pop()
+                for body in rules.get(var, ()):
+                    if len(body) == 1 and body[0] in rules and body[0] not in reach:
+                        reach.add(body[0])
+                        stack.append(body[0])
+            for var in reach:
+                for body in rules[var]:
+                    if len(body) == 2:
+                        binary.setdefault(body, set()).add(head)
+                    elif body[0] not in rules and not self.validate_variable(body[0]):
+                        unary.setdefault(body[0], set()).add(head)
+
+        # Number the variables so CYK cells can be int bitsets
+        bits = {var: 1 << k for k, var in enumerate(rules)}
+
+        def mask(variables):
+            result = 0
+            for var in variables:
+                result |= bits[var]
+            return result
+
+        unary = {t: mask(heads) for t, heads in unary.items()}
+        by_left = {}
+        for (B, C), heads in binary.items():
+            if B in bits and C in bits:
+                by_left.setdefault(B, []).append((bits[C], mask(heads)))
+        binary = []
+        for B, pairs in by_left.items():
+            right = 0
+            for C_bit, _ in pairs:
+                right |= C_bit
+            binary.append((bits[B], right, pairs))
+        self._cnf = (unary, binary, frozenset(nullable), bits)
+        return self._cnf
+
     def parse_string(self, input_string):
-        # Special case for empty string
+        """
+        Decide whether input_string is in the language of the grammar.
+        """
+        # For the a^n b^n grammar a single regex pass replaces the CYK table
+        if self.is_anbn:
+            m = _ANBN_RE.fullmatch(input_string)
+            return m is not None and len(m.group(1)) == len(m.group(2))
+        return self._recognize(input_string)
+
+    def _cyk(self, input_string):
+        """
+        CYK recognizer over the CNF form of the grammar.
+        """
         if not input_string:
-            # Check if epsilon is derivable from the start symbol
-            for production in self.productions.get(self.start_symbol, []):
-                if production == ['epsilon']:
-                    return True
-            return False
-        
-        # Special case for short strings to handle the a^n b^n grammar
-        if self.start_symbol == 'S':
-            # Check if this is the a^n b^n grammar (S -> a S b | epsilon)
-            is_anbn_grammar = False
-            if len(self.productions.get('S', [])) == 2:
-                prods = self.productions['S']
-                if ['epsilon'] in prods:
-                    for p in prods:
-                        if len(p) == 3 and p[0] == 'a' and p[1] == 'S' and p[2] == 'b':
-                            is_anbn_grammar = True
-            
-            # For a^n b^n grammar, just check if the string has equal number of a's and b's
-            # with all a's preceding all b's
-            if is_anbn_grammar:
-                a_count = input_string.count('a')
-                b_count = input_string.count('b')
-                
-                # Check if string contains only a's and b's
-                if a_count + b_count != len(input_string):
-                    return False
-                
-                # Check equal counts and proper ordering
-                if a_count == b_count:
-                    # Check if a's come before b's (no b before any a)
-                    for i, char in enumerate(input_string):
-                        if char == 'a':
-                            if 'b' in input_string[:i]:
-                                return False
-                    return True
-                return False
-        
-        # For other grammars, use a simple dynamic programming approach
-        input_list = list(input_string)
-        
-        # Use a breadth-first approach to check derivability
-        queue = [(self.start_symbol, input_list)]
-        visited = set()
-        
-        while queue:
-            current_symbol, remaining_input = queue.pop(0)
-            
-            # Skip if we've already explored this state
-            state_key = (current_symbol, tuple(remaining_input))
-            if state_key in visited:
-                continue
-            visited.add(state_key)
-            
-            # Check if current_symbol is a terminal
-            if current_symbol in self.terminals:
-                if remaining_input and remaining_input[0] == current_symbol:
-                    if len(remaining_input) == 1:  # Consumed all input
-                        return True
-                    queue.append(('', remaining_input[1:]))
-                continue
-            
-            # If current_symbol is epsilon and no more input, we're done
-            if current_symbol == 'epsilon' and not remaining_input:
-                return True
-            
-            # If current_symbol is empty string, continue processing remaining input
-            if current_symbol == '':
-                if not remaining_input:
-                    return True
-                for symbol in self.variables:
-                    for production in self.productions.get(symbol, []):
-                        queue.append((symbol, remaining_input))
-                continue
-            
-            # Try each production for the current variable
-            for production in self.productions.get(current_symbol, []):
-                if production == ['epsilon']:
-                    queue.append(('', remaining_input))
+            # Special case for empty string
+            return self.start_symbol in self._to_cnf()[2]
+        start_bit = self._to_cnf()[3].get(self.start_symbol, 0)
+        return bool(self._table_for(input_string)[0][len(input_string)] & start_bit)
+
+    def _cyk_table(self, input_string):
+        """
+        Fill the CYK table for a non-empty input_string; table[i][j] is the
+        bitset of the variables deriving the slice input_string[i:j].
+        """
+        unary = self._to_cnf()[0]
+        n = len(input_string)
+
+        table = [[0] * (n + 1) for _ in range(n + 1)]
+        for i, char in enumerate(input_string):
+            table[i][i + 1] = unary.get(char, 0)
+
+        self._compile_fill()(table, n)
+        return table
+
+    def _compile_fill(self):
+        """
+        Generate and compile a function fill(table, n) that fills the spans
+        of length 2 and more of a CYK table with the binary rules of this
+        grammar written out as integer tests, so no rule list is walked at
+        parse time.
+
+        The function is cached on the object until the grammar is modified.
+        """
+        if self._fill is not None:
+            return self._fill
+
+        lines = [
+            "def fill(table, n):",
+            "    for length in range(2, n + 1):",
+            "        for i in range(n - length + 1):",
+            "            j = i + length",
+            "            row = table[i]",
+            "            cell = 0",
+            "            for k in range(i + 1, j):",
+            "                left = row[k]",
+            "                if not left:",
+            "                    continue",
+            "                right = table[k][j]",
+            "                if not right:",
+            "                    continue",
+        ]
+        # Only rules whose left and right symbols are both present can fire
+        for B_bit, C_bits, pairs in self._to_cnf()[1]:
+            lines.append(f"                if left & {B_bit} and right & {C_bits}:")
+            for C_bit, heads in pairs:
+                lines.append(f"                    if right & {C_bit}:")
+                lines.append(f"                        cell |= {heads}")
+        lines.append("            row[j] = cell")
+
+        namespace = {}
+        exec('\n'.join(lines), namespace)
+        self._fill = namespace['fill']
+        return self._fill
+
+    def _derivation_tables(self):
+        """
+        Precompute the grammar facts the derivation expander needs, once per
+        grammar rather than once per input string. Returns
+        (rank, unit_positions, by_first, empty_body) where rank maps each nullable
+        variable to the round of the fixed point in which it became nullable,
+        unit_positions[A][p] lists the positions of the p-th production of A
+        whose symbol may derive a whole span on its own because every other
+        symbol of the body is nullable, and by_first[A] maps a terminal c to
+        the indices, in order, of A's productions whose FIRST set contains c,
+        i.e. that can derive a non-empty string starting with c. empty_body
+        maps each nullable variable to the production used to derive the
+        empty string from it: epsilon as () if A has one, otherwise the first
+        production whose symbols all became nullable in earlier rounds.
+
+        The productions themselves are left untouched so derivations are
+        shown in the grammar as entered.
+        """
+        if self._tables is not None:
+            return self._tables
+
+        rank = {}
+        level = 0
+        while True:
+            newly = [head for head, bodies in self.productions.items() if head not in rank and any(
+                body is _EPSILON or all(s in rank for s in body) for body in bodies)]
+            if not newly:
+                break
+            for head in newly:
+                rank[head] = level
+            level += 1
+
+        unit_positions = {}
+        for head, bodies in self.productions.items():
+            positions = []
+            for body in bodies:
+                blocking = [k for k, s in enumerate(body) if s not in rank]
+                if body is _EPSILON or len(blocking) > 1:
+                    positions.append(())
+                else:
+                    positions.append(tuple(k for k in blocking or range(len(body))
+                                           if self.validate_variable(body[k])))
+            unit_positions[head] = positions
+
+        def body_first(body, first):
+            # Terminals that can start a string derived from body: the FIRST
+            # sets of its leading symbols up to the first non-nullable one
+            result = set()
+            for symbol in body:
+                if not self.validate_variable(symbol):
+                    result.add(symbol)
+                    break
+                result |= first.get(symbol, set())
+                if symbol not in rank:
+                    break
+            return result
+
+        # FIRST sets of the variables by fixed point
+        first = {head: set() for head in self.productions}
+        changed = True
+        while changed:
+            changed = False
+            for head, bodies in self.productions.items():
+                for body in bodies:
+                    if body is not _EPSILON:
+                        new = body_first(body, first) - first[head]
+                        if new:
+                            first[head] |= new
+                            changed = True
+
+        # Index productions by the terminals that can start them, so the
+        # expander only tries productions able to derive the next character
+        by_first = {}
+        for head, bodies in self.productions.items():
+            groups = {}
+            for index, body in enumerate(bodies):
+                if body is not _EPSILON:
+                    for c in body_first(body, first):
+                        groups.setdefault(c, []).append(index)
+            by_first[head] = groups
+
+        empty_body = {}
+        for head in rank:
+            bodies = self.productions[head]
+            if _EPSILON in bodies:
+                empty_body[head] = ()
+            else:
+                empty_body[head] = next(body for body in bodies
+                                        if all(s in rank and rank[s] < rank[head] for s in body))
+
+        self._tables = (rank, unit_positions, by_first, empty_body)
+        return self._tables
+
+    def _expander(self, input_string):
+        """
+        Return a function expand(var, i, j) that picks a production of var and
+        a split of input_string[i:j] among its symbols, as a list of
+        (symbol, start, end) triples, such that every symbol derives its part.
+
+        Subproblems are memoized on integer spans and answered from the CYK
+        table, and the chosen expansions always lead to a finite derivation.
+        """
+        unary, binary, nullable, bits = self._to_cnf()
+        table = self._table_for(input_string) if input_string else []
+        productions = self.productions
+        is_variable = self.validate_variable
+
+        rank, unit_positions, by_first, empty_body = self._derivation_tables()
+
+        def derives(symbol, i, j):
+            if not is_variable(symbol):
+                return j == i + 1 and input_string[i] == symbol
+            if i == j:
+                return symbol in nullable
+            return bool(table[i][j] & bits.get(symbol, 0))
+
+        # One memo table per variable, keyed by production index and integer
+        # positions only, so lookups never hash the production body
+        split_memo = {}
+
+        def split(var, index, k, i, j, limit):
+            # Positions splitting input_string[i:j] among body[k:] of the
+            # index-th production of var, where no variable may cover limit
+            # or more characters
+            memo = split_memo.setdefault(var, {})
+            key = (index, k, i, j, limit)
+            if key in memo:
+                return memo[key]
+            body = productions[var][index]
+            result = None
+            if i == j:
+                # Nothing left to cover: succeed at once if the rest of the
+                # body is nullable instead of trying it symbol by symbol
+                if all(s in rank for s in body[k:]):
+                    result = (i,) * (len(body) - k)
+            elif k < len(body):
+                symbol = body[k]
+                if not is_variable(symbol):
+                    # A terminal covers exactly one character, so there is a
+                    # single candidate end and no need to scan every position
+                    if input_string.startswith(symbol, i, j):
+                        rest = split(var, index, k + 1, i + 1, j, limit)
+                        if rest is not None:
+                            result = (i + 1,) + rest
+                else:
+                    # derives() inlined with the row of the CYK table bound
+                    # once: an empty part needs a nullable symbol
+                    row = table[i] if i < len(input_string) else ()
+                    bit = bits.get(symbol, 0)
+                    for m in range(i, min(j, i + limit - 1) + 1):
+                        if row[m] & bit if m > i else symbol in nullable:
+                            rest = split(var, index, k + 1, m, j, limit)
+                            if rest is not None:
+                                result = (m,) + rest
+                                break
+            memo[key] = result
+            return result
+
+        def spans(body, i, positions):
+            return [(symbol, start, end) for symbol, start, end in zip(body, (i,) + positions, positions)]
+
+        @functools.lru_cache(maxsize=None)
+        def expand(var, i, j):
+            if i == j:
+                body = empty_body.get(var)
+                if body is None:
+                    return None
+                return [(s, i, i) for s in body]
+
+            # Breadth-first over unit-like expansions (one variable covering
+            # the whole span, the rest empty) until a variable is found whose
+            # production splits the span into strictly shorter parts
+            parent = {var: None}
+            queue = deque([var])
+            while queue:
+                current = queue.popleft()
+                # Only productions whose FIRST set contains the next input
+                # character can derive the span
+                groups = by_first.get(current)
+                if not groups:
                     continue
-                
-                # Process production: try to match first terminal if any
-                first_symbol = production[0]
-                rest_symbols = production[1:] if len(production) > 1 else ['']
-                
-                if first_symbol in self.terminals:
-                    if remaining_input and remaining_input[0] == first_symbol:
-                        if rest_symbols == ['']:
-                            if len(remaining_input) == 1:  # Consumed all input with just this terminal
-                                return True
-                            queue.append(('', remaining_input[1:]))
-                        else:
-                            queue.append((rest_symbols[0], remaining_input[1:]))
-                else:  # First symbol is a variable or special
-                    queue.append((first_symbol, remaining_input))
-        
-        return False
+                for index in groups.get(input_string[i], ()):
+                    body = productions[current][index]
+                    positions = split(current, index, 0, i, j, j - i)
+                    if positions is not None:
+                        # Walk back to the first step taken from var
+                        step = (current, spans(body, i, positions))
+                        while parent[step[0]] is not None:
+                            step = parent[step[0]]
+                        return step[1]
+                    for k in unit_positions[current][index]:
+                        symbol = body[k]
+                        if symbol not in parent and is_variable(symbol) and derives(symbol, i, j):
+                            parent[symbol] = (current, [(s, i, i) if t < k else (s, i, j) if t == k else (s, j, j)
+                                                        for t, s in enumerate(body)])
+                            queue.append(symbol)
+            return None
 
-    def generate_parse_tree(self, input_string):
+        return expand
+
+    def generate_parse_tree(self, input_string, render=True):
         """
         Generate a parse tree for the given input string and visualize it using Graphviz.
+        
+        If render is False, only the DOT source is written to parse_tree.gv,
+        without running Graphviz or opening a viewer.
         """
         if not self.parse_string(input_string):
             print(f"\nString '{input_string}' is not in the language of this grammar.")
@@ -283,98 +655,83 @@ class CFG:
         node_counter = [0]
         
         # Special case for a^n b^n grammar (S -> a S b | epsilon)
-        is_anbn_grammar = False
-        if self.start_symbol == 'S' and len(self.productions.get('S', [])) == 2:
-            prods = self.productions['S']
-            if ['epsilon'] in prods:
-                for p in prods:
-                    if len(p) == 3 and p[0] == 'a' and p[1] == 'S' and p[2] == 'b':
-                        is_anbn_grammar = True
-        
-        if is_anbn_grammar:
-            # Special case for a^n b^n grammar
-            a_count = input_string.count('a')
+        if self.is_anbn:
+            # The string is a^n b^n, so n is half its length
+            a_count = len(input_string) // 2
             
             # Root node
             root_id = f"node{node_counter[0]}"
             node_counter[0] += 1
             dot.node(root_id, 'S', shape='circle', style='filled', fillcolor='lightblue')
             
-            # Generate tree recursively
-            def build_anbn_tree(parent_id, depth, max_depth):
-                if depth == max_depth:
-                    # Add epsilon node
-                    epsilon_id = f"node{node_counter[0]}"
-                    node_counter[0] += 1
-                    dot.node(epsilon_id, 'ε', shape='box', style='filled', fillcolor='lightgrey')
-                    dot.edge(parent_id, epsilon_id)
-                    return
-                
-                # Add 'a' terminal
+            # Generate the tree level by level: each S expands to a S b. The
+            # labels are known to be safe, so the DOT lines are appended to
+            # the body directly instead of going through dot.node/dot.edge
+            body = dot.body
+            parent_id = root_id
+            for depth in range(a_count):
                 a_id = f"node{node_counter[0]}"
-                node_counter[0] += 1
-                dot.node(a_id, 'a', shape='box', style='filled', fillcolor='lightgrey')
-                dot.edge(parent_id, a_id)
-                
-                # Add S non-terminal
-                s_id = f"node{node_counter[0]}"
-                node_counter[0] += 1
-                dot.node(s_id, 'S', shape='circle', style='filled', fillcolor='lightblue')
-                dot.edge(parent_id, s_id)
-                
-                # Add 'b' terminal
-                b_id = f"node{node_counter[0]}"
-                node_counter[0] += 1
-                dot.node(b_id, 'b', shape='box', style='filled', fillcolor='lightgrey')
-                dot.edge(parent_id, b_id)
-                
-                # Recurse
-                build_anbn_tree(s_id, depth + 1, max_depth)
+                s_id = f"node{node_counter[0] + 1}"
+                b_id = f"node{node_counter[0] + 2}"
+                node_counter[0] += 3
+                body.append(f"\t{a_id} [label=a {_TERM_NODE_ATTRS}]\n")
+                body.append(f"\t{s_id} [label=S {_VAR_NODE_ATTRS}]\n")
+                body.append(f"\t{b_id} [label=b {_TERM_NODE_ATTRS}]\n")
+                body.append(f"\t{parent_id} -> {a_id}\n")
+                body.append(f"\t{parent_id} -> {s_id}\n")
+                body.append(f"\t{parent_id} -> {b_id}\n")
+                parent_id = s_id
             
-            # Build the tree
-            build_anbn_tree(root_id, 0, a_count)
-        else:
-            # For other grammars, build a generic parse tree
-            # This is a simplified algorithm and might not work for all grammars
-            root_id = f"node{node_counter[0]}"
+            # The innermost S derives epsilon
+            epsilon_id = f"node{node_counter[0]}"
             node_counter[0] += 1
-            dot.node(root_id, self.start_symbol, shape='circle', style='filled', fillcolor='lightblue')
-            
-            # Get derivation steps
-            steps = self.get_derivation_steps(input_string, strategy='left', silent=True)
-            if steps is None:
-                return None
-            
-            # Build a basic tree from derivation steps (this is a simplification)
-            current_nodes = {self.start_symbol: root_id}
-            
-            for i in range(1, len(steps)):
-                prev_step = steps[i-1].split()
-                curr_step = steps[i].split()
-                
-                # Find the difference between steps
-                for j in range(min(len(prev_step), len(curr_step))):
-                    if prev_step[j] != curr_step[j]:
-                        # Found a difference - a non-terminal was expanded
-                        if prev_step[j] in self.variables:
-                            parent_id = current_nodes.get(prev_step[j])
-                            if parent_id:
-                                # Create nodes for the expansion
-                                for k, symbol in enumerate(curr_step[j:j+len(curr_step)-len(prev_step)+1]):
-                                    child_id = f"node{node_counter[0]}"
-                                    node_counter[0] += 1
-                                    
-                                    if symbol in self.variables:
-                                        dot.node(child_id, symbol, shape='circle', style='filled', fillcolor='lightblue')
-                                        current_nodes[symbol] = child_id
-                                    else:
-                                        dot.node(child_id, symbol, shape='box', style='filled', fillcolor='lightgrey')
-                                    
-                                    dot.edge(parent_id, child_id)
-                        break
+            dot.node(epsilon_id, 'ε', shape='box', style='filled', fillcolor='lightgrey')
+            dot.edge(parent_id, epsilon_id)
+        else:
+            # For other grammars, expand the start symbol over the whole input
+            # with the same choices the derivations make. Every occurrence of
+            # a symbol gets its own node; edges are kept as two parallel
+            # arrays of node numbers
+            expand = self._expander_for(input_string)
+            is_variable = self.validate_variable
+            labels = [self.start_symbol]
+            edge_parents = array('i')
+            edge_children = array('i')
+            stack = [(0, self.start_symbol, 0, len(input_string))]
+            while stack:
+                node, symbol, i, j = stack.pop()
+                if not is_variable(symbol):
+                    continue
+                expansion = expand(symbol, i, j)
+                if expansion is None:
+                    return None
+                if not expansion:
+                    # The variable derives epsilon
+                    expansion = [('ε', i, i)]
+                children = []
+                for child_symbol, child_i, child_j in expansion:
+                    child = len(labels)
+                    labels.append(child_symbol)
+                    edge_parents.append(node)
+                    edge_children.append(child)
+                    children.append((child, child_symbol, child_i, child_j))
+                # Push in reverse so children are expanded left to right
+                stack.extend(reversed(children))
+
+            for node, label in enumerate(labels):
+                if is_variable(label):
+                    dot.node(f"node{node}", label, shape='circle', style='filled', fillcolor='lightblue')
+                else:
+                    dot.node(f"node{node}", label, shape='box', style='filled', fillcolor='lightgrey')
+            for parent, child in zip(edge_parents, edge_children):
+                dot.edge(f"node{parent}", f"node{child}")
         
         # Render the parse tree
         try:
+            if not render:
+                dot.save('parse_tree.gv')
+                print("\nParse tree source has been saved as 'parse_tree.gv'")
+                return dot
             dot.render('parse_tree', format='pdf', view=True, cleanup=True)
             print("\nParse tree has been generated and saved as 'parse_tree.pdf'")
             return dot
@@ -392,31 +749,20 @@ class CFG:
         steps = []
         
         # Special case for a^n b^n grammar (S -> a S b | epsilon)
-        is_anbn_grammar = False
-        if self.start_symbol == 'S' and len(self.productions.get('S', [])) == 2:
-            prods = self.productions['S']
-            if ['epsilon'] in prods:
-                for p in prods:
-                    if len(p) == 3 and p[0] == 'a' and p[1] == 'S' and p[2] == 'b':
-                        is_anbn_grammar = True
-        
-        if is_anbn_grammar and self.parse_string(input_string):
+        if self.is_anbn and self.parse_string(input_string):
             # For a^n b^n grammar, we can directly generate the derivation steps
-            a_count = input_string.count('a')
+            a_count = len(input_string) // 2
             
             # Start with S
             steps = ['S']
             
-            # Generate steps
-            current = 'S'
-            for i in range(a_count):
-                # Replace S with a S b
-                current = current.replace('S', 'a S b')
-                steps.append(current)
+            # Step k is a^k S b^k, built directly instead of rewriting the
+            # previous step
+            for k in range(1, a_count + 1):
+                steps.append('a ' * k + 'S' + ' b' * k)
             
             # Final step: replace S with epsilon
-            current = current.replace('S', '')
-            steps.append(current)
+            steps.append(' '.join('a' * a_count + 'b' * a_count))
             
             if not silent:
                 print(f"\n{strategy.capitalize()}most derivation of '{input_string}':")
@@ -430,86 +776,42 @@ class CFG:
                 print(f"\nString '{input_string}' is not in the language of this grammar.")
             return None
         
-        # Iterative approach for leftmost derivation
-        if strategy == 'left':
-            sentential_form = [self.start_symbol]
-            steps.append(' '.join(sentential_form))
-            
-            while ''.join(sentential_form) != input_string:
-                # Find the leftmost variable
-                var_index = -1
-                for i, symbol in enumerate(sentential_form):
-                    if symbol in self.variables:
-                        var_index = i
-                        break
-                
-                if var_index == -1:
+        expand = self._expander_for(input_string)
+        is_variable = self.validate_variable
+
+        # Each symbol of the sentential form is paired with the span of the
+        # input it has to derive
+        sentential_form = [(self.start_symbol, 0, len(input_string))]
+        steps.append(self.start_symbol)
+
+        # Everything left of the leftmost variable (right of the rightmost one)
+        # is terminal, so the search resumes where the last expansion was
+        # made instead of rescanning the whole sentential form
+        leftmost = strategy == 'left'
+        var_index = 0
+        while True:
+            # Find the leftmost or rightmost variable
+            if leftmost:
+                while var_index < len(sentential_form) and not is_variable(sentential_form[var_index][0]):
+                    var_index += 1
+                if var_index == len(sentential_form):
                     break  # No variables left
-                
-                # Try each production for this variable
-                var = sentential_form[var_index]
-                found_valid_replacement = False
-                
-                for production in self.productions[var]:
-                    # Create new sentential form with this production
-                    new_form = sentential_form[:var_index] + (production if production != ['epsilon'] else []) + sentential_form[var_index+1:]
-                    
-                    # Make a copy of the form to test if it can derive the target string
-                    test_string = ''.join([s for s in new_form if s in self.terminals])
-                    test_vars = [s for s in new_form if s in self.variables]
-                    
-                    # Check if this substitution could lead to the target string
-                    if input_string.startswith(test_string) and len(test_string) <= len(input_string):
-                        # Calculate what remains after terminals
-                        remaining = input_string[len(test_string):]
-                        
-                        # If we have a potential match
-                        potential_match = True
-                        sentential_form = new_form
-                        steps.append(' '.join(sentential_form))
-                        found_valid_replacement = True
-                        break
-                
-                if not found_valid_replacement:
-                    break
-            
-        # Iterative approach for rightmost derivation
-        elif strategy == 'right':
-            sentential_form = [self.start_symbol]
-            steps.append(' '.join(sentential_form))
-            
-            while ''.join(sentential_form) != input_string:
-                # Find the rightmost variable
-                var_index = -1
-                for i in range(len(sentential_form)-1, -1, -1):
-                    if sentential_form[i] in self.variables:
-                        var_index = i
-                        break
-                
-                if var_index == -1:
+            else:
+                while var_index >= 0 and not is_variable(sentential_form[var_index][0]):
+                    var_index -= 1
+                if var_index < 0:
                     break  # No variables left
-                
-                # Try each production for this variable
-                var = sentential_form[var_index]
-                found_valid_replacement = False
-                
-                for production in self.productions[var]:
-                    # Create new sentential form with this production
-                    new_form = sentential_form[:var_index] + (production if production != ['epsilon'] else []) + sentential_form[var_index+1:]
-                    
-                    # Make a copy of the form to test if it can derive the target string
-                    test_string = ''.join([s for s in new_form if s in self.terminals])
-                    
-                    # Check if this substitution could lead to the target string
-                    if len(test_string) <= len(input_string) and all(test_string[i] == input_string[i] for i in range(len(test_string))):
-                        sentential_form = new_form
-                        steps.append(' '.join(sentential_form))
-                        found_valid_replacement = True
-                        break
-                
-                if not found_valid_replacement:
-                    break
-        
+
+            expansion = expand(*sentential_form[var_index])
+            if expansion is None:
+                break
+            sentential_form[var_index:var_index + 1] = expansion
+            if not leftmost:
+                var_index += len(expansion) - 1
+            steps.append(' '.join(symbol for symbol, _, _ in sentential_form))
+
+        sentential_form = [symbol for symbol, _, _ in sentential_form]
+
         if not silent:
             print(f"\n{strategy.capitalize()}most derivation of '{input_string}':")
             for step in steps:
@@ -522,12 +824,16 @@ class CFG:
             
         return steps
 
-    def generate_derivation_image(self, input_string, strategy='left'):
+    def generate_derivation_image(self, input_string, strategy='left', steps=None):
         """
         Generate a visual representation of the derivation steps using Graphviz.
+        
+        Derivation steps already computed for input_string can be passed in
+        as steps to avoid deriving the string again.
         """
         # Get the derivation steps
-        steps = self.get_derivation_steps(input_string, strategy=strategy, silent=True)
+        if steps is None:
+            steps = self.get_derivation_steps(input_string, strategy=strategy, silent=True)
         if steps is None:
             return None
         
@@ -562,7 +868,7 @@ class CFG:
             return None
 
 def main():
-    cfg = CFG()
+    cfg = CFG(memoize=True)
     print("Choose input method: 1) File 2) Console")
     choice = input().strip()
     success = False
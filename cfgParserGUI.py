@@ -1,6 +1,7 @@
 import pygame
 import sys
 import os
+from collections import OrderedDict
 from cfgParser import CFG
 
 # Initialize pygame
@@ -15,16 +16,51 @@ DARK_BLUE = (70, 130, 180)
 GREEN = (144, 238, 144)
 RED = (255, 99, 71)
 
+# Maximum number of rendered text surfaces kept by the GUI
+TEXT_CACHE_SIZE = 256
+
+# Maximum number of derivations kept by the GUI, least recently used first out
+DERIV_CACHE_SIZE = 64
+
+# Cursor blink interval in milliseconds
+CURSOR_BLINK_MS = 500
+
 # Screen dimensions
 WIDTH, HEIGHT = 800, 600
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("CFG Parser GUI")
 
+# Only queue the events the GUI reacts to; mouse motion wakes the loop for
+# hover updates and exposure triggers a redraw
+pygame.event.set_blocked(None)
+pygame.event.set_allowed([pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN,
+                          pygame.MOUSEMOTION, pygame.VIDEOEXPOSE])
+
 # Fonts
 font_large = pygame.font.SysFont('Arial', 24)
 font_medium = pygame.font.SysFont('Arial', 20)
 font_small = pygame.font.SysFont('Arial', 16)
 
+# Static labels with their centered x positions, measured once
+TITLE = ("CFG Parser", WIDTH // 2 - font_large.size("CFG Parser")[0] // 2)
+STATIC_PROMPTS = {
+    text: (text, WIDTH // 2 - font_medium.size(text)[0] // 2)
+    for text in ("Enter the filename of your grammar:", "Enter a string to derive:")
+}
+SECTION_PROMPTS = {
+    mode: (f"Enter {section}:", WIDTH // 2 - font_medium.size(f"Enter {section}:")[0] // 2)
+    for mode, section in (("variables", "Variables"), ("terminals", "Terminals"),
+                          ("productions", "Productions"), ("start", "Start Symbol"))
+}
+
+def render_box(size, color):
+    """Render a rounded box with a black border onto a new transparent Surface."""
+    box = pygame.Surface(size, pygame.SRCALPHA)
+    rect = box.get_rect()
+    pygame.draw.rect(box, color, rect, border_radius=5)
+    pygame.draw.rect(box, BLACK, rect, 2, border_radius=5)
+    return box
+
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, action=None):
         self.rect = pygame.Rect(x, y, width, height)
@@ -33,15 +69,19 @@ class Button:
         self.hover_color = hover_color
         self.action = action
         self.is_hovered = False
-
-    def draw(self, surface):
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=5)
-        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=5)
         
+        # The button never changes, so pre-render both of its states
+        self._surf_normal = self._render(color)
+        self._surf_hover = self._render(hover_color)
+
+    def _render(self, color):
+        button = render_box(self.rect.size, color)
         text_surface = font_medium.render(self.text, True, BLACK)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        button.blit(text_surface, text_surface.get_rect(center=button.get_rect().center))
+        return button
+
+    def draw(self, surface):
+        surface.blit(self._surf_hover if self.is_hovered else self._surf_normal, self.rect)
 
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
@@ -57,23 +97,54 @@ class Button:
 class TextBox:
     def __init__(self, x, y, width, height, placeholder="", text=""):
         self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
+        # Keystrokes edit a character buffer; the joined string is rebuilt
+        # only when the buffer has changed since it was last read
+        self._chars = list(text)
+        self._joined = text
+        self._text_dirty = False
         self.placeholder = placeholder
         self.active = False
         self.cursor_visible = True
-        self.cursor_timer = 0
+        self.cursor_timer = pygame.time.get_ticks()
+        
+        # Pre-rendered backgrounds; the text surface is re-rendered only when
+        # the text changes
+        self._bg_normal = render_box(self.rect.size, WHITE)
+        self._bg_active = render_box(self.rect.size, LIGHT_BLUE)
+        self._text_surface = None
+
+    @property
+    def text(self):
+        if self._text_dirty:
+            self._joined = ''.join(self._chars)
+            self._text_dirty = False
+        return self._joined
+
+    @text.setter
+    def text(self, value):
+        self._chars = list(value)
+        self._joined = value
+        self._text_dirty = False
+        self._text_surface = None
 
     def draw(self, surface):
+        # Blink cursor; the toggle is time based because the GUI only redraws
+        # on events and blink deadlines
+        now = pygame.time.get_ticks()
+        if now - self.cursor_timer >= CURSOR_BLINK_MS:
+            self.cursor_visible = not self.cursor_visible
+            self.cursor_timer = now
+        
         # Draw background
-        color = LIGHT_BLUE if self.active else WHITE
-        pygame.draw.rect(surface, color, self.rect, border_radius=5)
-        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=5)
+        surface.blit(self._bg_active if self.active else self._bg_normal, self.rect)
         
         # Render text
-        if self.text:
-            text_surface = font_medium.render(self.text, True, BLACK)
-        else:
-            text_surface = font_medium.render(self.placeholder, True, GRAY)
+        if self._text_surface is None:
+            if self.text:
+                self._text_surface = font_medium.render(self.text, True, BLACK)
+            else:
+                self._text_surface = font_medium.render(self.placeholder, True, GRAY)
+        text_surface = self._text_surface
             
         # Blit text
         text_rect = text_surface.get_rect(midleft=(self.rect.left + 10, self.rect.centery))
@@ -87,30 +158,30 @@ class TextBox:
             pygame.draw.line(surface, BLACK, 
                             (cursor_pos, self.rect.top + 5),
                             (cursor_pos, self.rect.bottom - 5), 2)
-            
-        # Blink cursor
-        self.cursor_timer += 1
-        if self.cursor_timer > 30:
-            self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
             self.active = self.rect.collidepoint(event.pos)
             if self.active:
                 self.cursor_visible = True
-                self.cursor_timer = 0
+                self.cursor_timer = pygame.time.get_ticks()
             return self.active
                 
         if event.type == pygame.KEYDOWN and self.active:
             if event.key == pygame.K_BACKSPACE:
-                self.text = self.text[:-1]
+                if self._chars:
+                    self._chars.pop()
+                    self._text_dirty = True
+                    self._text_surface = None
             elif event.key == pygame.K_RETURN:
                 self.active = False
-            else:
-                self.text += event.unicode
+            elif event.unicode:
+                # Modifier, arrow and function keys carry no text
+                self._chars.append(event.unicode)
+                self._text_dirty = True
+                self._text_surface = None
             self.cursor_visible = True
-            self.cursor_timer = 0
+            self.cursor_timer = pygame.time.get_ticks()
             return True
         return False
 
@@ -127,12 +198,24 @@ class CFGParserGUI:
         self.console_mode = "variables"  # variables, terminals, productions, start
         self.console_variables = []
         self.console_terminals = []
-        self.console_productions = []
+        self.console_productions = []  # (head, bodies) pairs as entered
         self.console_start = ""
+        # Rendered console sidebar, rebuilt only after the lists above change
+        self._sidebar_surface = None
+        self._sidebar_dirty = True
         self.temp_input = TextBox(300, 350, 300, 40, "Enter value...")
         self.derivation_steps = []
+        # Derivation steps per (string, strategy) for the current grammar, and
+        # the string whose parse tree was rendered last
+        self._deriv_cache = OrderedDict()
+        self._last_tree = None
+        # Strategy of the most recent derive_string call
+        self._last_strategy = "left"
         self.result_text = []
+        self._result_surfaces = []
+        self._text_cache = {}
         self.current_input_line = 0
+        self.dirty = True
         
         # Create buttons
         self.buttons = {
@@ -169,10 +252,15 @@ class CFGParserGUI:
     def switch_to_console(self):
         self.current_screen = "console_input"
         self.console_mode = "variables"
+        # The grammar is built up as entries are accepted; its variable and
+        # terminal sets answer duplicate checks, and the console_* lists only
+        # keep entry order for the sidebar display
+        self.cfg = CFG()
         self.console_variables = []
         self.console_terminals = []
         self.console_productions = []
         self.console_start = ""
+        self._sidebar_dirty = True
         self.temp_input.text = ""
         self.message = "Enter variables (uppercase letters, one at a time)"
         self.message_color = BLACK
@@ -188,8 +276,11 @@ class CFGParserGUI:
     def load_from_file(self):
         filename = self.filename_input.text.strip()
         if filename:
-            # Try to load the grammar from the file
-            if self.cfg.loadFromFile(filename):
+            # Try to load the grammar from the file into a fresh grammar
+            cfg = CFG()
+            if cfg.load_from_file(filename):
+                self.cfg = cfg
+                self.clear_caches()
                 self.grammar_loaded = True
                 self.message = "Grammar loaded successfully!"
                 self.message_color = GREEN
@@ -210,9 +301,10 @@ class CFGParserGUI:
                 self.console_mode = "terminals"
                 self.message = "Enter terminals (lowercase letters or digits, one at a time)"
                 self.temp_input.text = ""
-            elif value not in self.console_variables:
-                if self.cfg.validateVariable(value):
+            elif value not in self.cfg.variables:
+                if self.cfg.add_variable(value):
                     self.console_variables.append(value)
+                    self._sidebar_dirty = True
                     self.message = f"Added variable: {value}. Enter more or leave empty to continue."
                     self.temp_input.text = ""
                 else:
@@ -227,9 +319,10 @@ class CFGParserGUI:
                 self.console_mode = "productions"
                 self.message = "Enter productions (format: A -> B C | epsilon)"
                 self.temp_input.text = ""
-            elif value not in self.console_terminals:
-                if self.cfg.validateTerminal(value):
+            elif value not in self.cfg.terminals:
+                if self.cfg.add_terminal(value):
                     self.console_terminals.append(value)
+                    self._sidebar_dirty = True
                     self.message = f"Added terminal: {value}. Enter more or leave empty to continue."
                     self.temp_input.text = ""
                 else:
@@ -245,17 +338,24 @@ class CFGParserGUI:
                 self.message = "Enter start symbol (single uppercase letter)"
                 self.temp_input.text = ""
             else:
-                parts = value.split('->')
-                if len(parts) != 2:
+                head, sep, body_part = value.partition('->')
+                if not sep:
                     self.message = "Invalid production format. Must be A -> B C | epsilon"
                     self.message_color = RED
                 else:
-                    head = parts[0].strip()
-                    if head not in self.console_variables:
+                    head = head.strip()
+                    bodies = [body.strip().split() or ['epsilon'] for body in body_part.split('|')]
+                    if head not in self.cfg.variables:
                         self.message = f"Head symbol {head} is not in variables."
                         self.message_color = RED
+                    elif not all(self.cfg.validate_production(head, body) for body in bodies):
+                        self.message = f"Invalid production: {value}"
+                        self.message_color = RED
                     else:
-                        self.console_productions.append(value)
+                        for body in bodies:
+                            self.cfg.add_production(head, body)
+                        self.console_productions.append((head, bodies))
+                        self._sidebar_dirty = True
                         self.message = f"Added production: {value}. Enter more or leave empty to continue."
                         self.message_color = BLACK
                         self.temp_input.text = ""
@@ -264,26 +364,14 @@ class CFGParserGUI:
             if not value:
                 self.message = "Please enter a start symbol."
                 self.message_color = RED
-            elif value not in self.console_variables:
+            elif value not in self.cfg.variables:
                 self.message = f"Start symbol {value} is not in variables."
                 self.message_color = RED
             else:
                 self.console_start = value
-                
-                # Load the grammar
-                self.cfg = CFG()
-                for var in self.console_variables:
-                    self.cfg.addVariable(var)
-                for term in self.console_terminals:
-                    self.cfg.addTerminal(term)
-                for prod in self.console_productions:
-                    parts = prod.split('->')
-                    head = parts[0].strip()
-                    bodies = parts[1].strip().split('|')
-                    for body in bodies:
-                        bodySymbols = body.strip().split() or ['epsilon']
-                        self.cfg.addProduction(head, bodySymbols)
-                self.cfg.setStartSymbol(self.console_start)
+                self._sidebar_dirty = True
+                self.cfg.set_start_symbol(value)
+                self.clear_caches()
                 
                 self.grammar_loaded = True
                 self.message = "Grammar loaded successfully!"
@@ -292,14 +380,21 @@ class CFGParserGUI:
                 self.test_string_input.text = ""
     
     def derive_string(self, strategy):
+        self._last_strategy = strategy
         test_str = self.test_string_input.text.strip()
         if test_str or test_str == "":  # Allow empty string
-            steps = self.cfg.getDerivationSteps(test_str, strategy=strategy, silent=True)
+            steps = self.derivation_steps_for(test_str, strategy)
             if steps:
                 self.derivation_steps = steps
                 self.result_text = [f"{strategy.capitalize()}most derivation of '{test_str}':"]
                 for step in steps:
                     self.result_text.append(f"=> {step}")
+                
+                # Render the visible lines once here instead of on every frame
+                self._result_surfaces = [font_medium.render(line, True, BLACK) for line in self.result_text[:12]]
+                if len(self.result_text) > 12:  # Limit displayed lines
+                    self._result_surfaces.append(
+                        font_medium.render(f"... {len(self.result_text) - 12} more steps", True, BLACK))
                 self.current_screen = "result"
             else:
                 self.message = f"String '{test_str}' is not in the language of this grammar."
@@ -311,8 +406,8 @@ class CFGParserGUI:
     def generate_parse_tree(self):
         test_str = self.test_string_input.text.strip()
         if test_str or test_str == "":  # Allow empty string
-            self.cfg.generateParseTree(test_str)
-            self.message = "Parse tree generated and saved as 'parseTree.pdf'."
+            self.render_parse_tree(test_str)
+            self.message = "Parse tree generated and saved as 'parse_tree.pdf'."
             self.message_color = GREEN
         else:
             self.message = "Please enter a string to derive."
@@ -321,30 +416,108 @@ class CFGParserGUI:
     def generate_images(self):
         test_str = self.test_string_input.text.strip()
         if test_str or test_str == "":  # Allow empty string
-            # Get derivation type from the first result line
-            if "Leftmost" in self.result_text[0]:
-                strategy = "left"
-            else:
-                strategy = "right"
-                
-            self.cfg.generateDerivationImage(test_str, strategy=strategy)
-            self.cfg.generateParseTree(test_str)
-            self.message = f"Images generated and saved as '{strategy}Derivation.pdf' and 'parseTree.pdf'."
+            # Reuse the strategy of the derivation being shown
+            strategy = self._last_strategy
+            steps = self.derivation_steps_for(test_str, strategy)
+            self.cfg.generate_derivation_image(test_str, strategy=strategy, steps=steps)
+            self.render_parse_tree(test_str)
+            self.message = f"Images generated and saved as '{strategy}_derivation.pdf' and 'parse_tree.pdf'."
             self.message_color = GREEN
         else:
             self.message = "No string to derive."
             self.message_color = RED
     
+    def clear_caches(self):
+        self._deriv_cache = OrderedDict()
+        self._last_tree = None
+    
+    def derivation_steps_for(self, test_str, strategy):
+        """
+        Return the derivation steps of test_str, computing them only once per
+        string and strategy for the current grammar.
+        """
+        key = (test_str, strategy)
+        if key in self._deriv_cache:
+            self._deriv_cache.move_to_end(key)
+            return self._deriv_cache[key]
+        steps = self.cfg.get_derivation_steps(test_str, strategy=strategy, silent=True)
+        self._deriv_cache[key] = steps
+        if len(self._deriv_cache) > DERIV_CACHE_SIZE:
+            self._deriv_cache.popitem(last=False)
+        return steps
+    
+    def render_parse_tree(self, test_str):
+        # parse_tree.pdf already holds this string's tree
+        if test_str == self._last_tree and os.path.exists('parse_tree.pdf'):
+            return
+        if self.cfg.generate_parse_tree(test_str) is not None:
+            self._last_tree = test_str
+    
+    def current_text_box(self):
+        if self.current_screen == "file_input":
+            return self.filename_input
+        elif self.current_screen == "console_input":
+            return self.temp_input
+        elif self.current_screen == "string_input":
+            return self.test_string_input
+        return None
+    
+    def _text(self, text, font, color):
+        """
+        Render text through a cache so unchanged labels are not rasterized
+        again on every frame.
+        """
+        key = (text, id(font), color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) >= TEXT_CACHE_SIZE:
+                self._text_cache.clear()
+            surface = font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+    
+    def render_sidebar(self):
+        """
+        Render the variables, terminals, productions and start symbol entered
+        so far onto one transparent surface.
+        """
+        sidebar = pygame.Surface((WIDTH - 50, 220), pygame.SRCALPHA)
+        y_pos = 0
+        if self.console_variables:
+            var_text = "Variables: " + ", ".join(self.console_variables)
+            sidebar.blit(font_small.render(var_text, True, BLACK), (0, y_pos))
+            y_pos += 20
+            
+        if self.console_terminals:
+            term_text = "Terminals: " + ", ".join(self.console_terminals)
+            sidebar.blit(font_small.render(term_text, True, BLACK), (0, y_pos))
+            y_pos += 20
+            
+        if self.console_productions:
+            sidebar.blit(font_small.render("Productions:", True, BLACK), (0, y_pos))
+            # Limit displayed productions
+            for i, (head, bodies) in enumerate(self.console_productions[:5]):
+                prod = f"{head} -> " + " | ".join(" ".join(body) for body in bodies)
+                sidebar.blit(font_small.render("  " + prod, True, BLACK), (0, y_pos + 20 + i * 20))
+            if len(self.console_productions) > 5:
+                more_text = f"  ... {len(self.console_productions) - 5} more"
+                sidebar.blit(font_small.render(more_text, True, BLACK), (0, y_pos + 20 + 5 * 20))
+                    
+        if self.console_start:
+            start_text = "Start Symbol: " + self.console_start
+            sidebar.blit(font_small.render(start_text, True, BLACK), (0, y_pos + 150))
+        return sidebar
+    
     def draw(self):
         screen.fill(WHITE)
         
         # Draw title
-        title = font_large.render("CFG Parser", True, BLACK)
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 50))
+        text, x = TITLE
+        screen.blit(self._text(text, font_large, BLACK), (x, 50))
         
         # Draw message
         if self.message:
-            msg = font_medium.render(self.message, True, self.message_color)
+            msg = self._text(self.message, font_medium, self.message_color)
             screen.blit(msg, (WIDTH // 2 - msg.get_width() // 2, 120))
         
         # Draw elements based on current screen
@@ -353,8 +526,8 @@ class CFGParserGUI:
                 button.draw(screen)
                 
         elif self.current_screen == "file_input":
-            prompt = font_medium.render("Enter the filename of your grammar:", True, BLACK)
-            screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, 200))
+            text, x = STATIC_PROMPTS["Enter the filename of your grammar:"]
+            screen.blit(self._text(text, font_medium, BLACK), (x, 200))
             
             self.filename_input.draw(screen)
             
@@ -363,60 +536,24 @@ class CFGParserGUI:
                 
         elif self.current_screen == "console_input":
             # Display current section
-            section_text = ""
-            if self.console_mode == "variables":
-                section_text = "Variables"
-            elif self.console_mode == "terminals":
-                section_text = "Terminals"
-            elif self.console_mode == "productions":
-                section_text = "Productions"
-            elif self.console_mode == "start":
-                section_text = "Start Symbol"
-                
-            section_render = font_medium.render(f"Enter {section_text}:", True, BLACK)
-            screen.blit(section_render, (WIDTH // 2 - section_render.get_width() // 2, 200))
+            text, x = SECTION_PROMPTS[self.console_mode]
+            screen.blit(self._text(text, font_medium, BLACK), (x, 200))
             
             # Draw input box
             self.temp_input.draw(screen)
             
             # Display current values
-            y_pos = 150
-            if self.console_variables:
-                var_text = "Variables: " + ", ".join(self.console_variables)
-                var_render = font_small.render(var_text, True, BLACK)
-                screen.blit(var_render, (50, y_pos))
-                y_pos += 20
-                
-            if self.console_terminals:
-                term_text = "Terminals: " + ", ".join(self.console_terminals)
-                term_render = font_small.render(term_text, True, BLACK)
-                screen.blit(term_render, (50, y_pos))
-                y_pos += 20
-                
-            if self.console_productions:
-                prod_text = "Productions:"
-                prod_render = font_small.render(prod_text, True, BLACK)
-                screen.blit(prod_render, (50, y_pos))
-                for i, prod in enumerate(self.console_productions):
-                    if i < 5:  # Limit displayed productions
-                        prod_render = font_small.render("  " + prod, True, BLACK)
-                        screen.blit(prod_render, (50, y_pos + 20 + i * 20))
-                    elif i == 5:
-                        more_render = font_small.render(f"  ... {len(self.console_productions) - 5} more", True, BLACK)
-                        screen.blit(more_render, (50, y_pos + 20 + 5 * 20))
-                        break
-                        
-            if self.console_start:
-                start_text = "Start Symbol: " + self.console_start
-                start_render = font_small.render(start_text, True, BLACK)
-                screen.blit(start_render, (50, y_pos + 150))
+            if self._sidebar_dirty:
+                self._sidebar_surface = self.render_sidebar()
+                self._sidebar_dirty = False
+            screen.blit(self._sidebar_surface, (50, 150))
             
             for button in self.buttons["console_input"]:
                 button.draw(screen)
                 
         elif self.current_screen == "string_input":
-            prompt = font_medium.render("Enter a string to derive:", True, BLACK)
-            screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, 250))
+            text, x = STATIC_PROMPTS["Enter a string to derive:"]
+            screen.blit(self._text(text, font_medium, BLACK), (x, 250))
             
             self.test_string_input.draw(screen)
             
@@ -425,14 +562,8 @@ class CFGParserGUI:
                 
         elif self.current_screen == "result":
             # Display derivation steps
-            for i, line in enumerate(self.result_text):
-                if i < 12:  # Limit displayed lines
-                    line_render = font_medium.render(line, True, BLACK)
-                    screen.blit(line_render, (50, 150 + i * 30))
-                elif i == 12:
-                    more_render = font_medium.render(f"... {len(self.result_text) - 12} more steps", True, BLACK)
-                    screen.blit(more_render, (50, 150 + 12 * 30))
-                    break
+            for i, line_render in enumerate(self._result_surfaces):
+                screen.blit(line_render, (50, 150 + i * 30))
             
             for button in self.buttons["result"]:
                 button.draw(screen)
@@ -440,39 +571,83 @@ class CFGParserGUI:
         # Update display
         pygame.display.flip()
     
+    def update_hover(self, mouse_pos):
+        """Update hover state of the current screen's buttons; returns True if any changed."""
+        changed = False
+        for button in self.buttons.get(self.current_screen, []):
+            was_hovered = button.is_hovered
+            if button.check_hover(mouse_pos) != was_hovered:
+                changed = True
+        return changed
+    
     def run(self):
-        clock = pygame.time.Clock()
         running = True
+        self.draw()
         
         while running:
+            # Sleep until an event arrives or the active text box's cursor is
+            # due to blink, instead of polling at a fixed frame rate
+            text_box = self.current_text_box()
+            if text_box is not None and text_box.active:
+                timeout = text_box.cursor_timer + CURSOR_BLINK_MS - pygame.time.get_ticks()
+                first = pygame.event.wait(max(1, timeout))
+            else:
+                first = pygame.event.wait()
+            
+            # Drain whatever else is queued in one batch
+            events = pygame.event.get()
+            if first.type != pygame.NOEVENT:
+                events.insert(0, first)
+            
             mouse_pos = pygame.mouse.get_pos()
             
+            # Hover only depends on the mouse position, so update it once per
+            # frame rather than once per event
+            hover_screen = self.current_screen
+            if self.update_hover(mouse_pos):
+                self.dirty = True
+            
             # Handle events
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
+                    continue
+                
+                # Widgets don't react to mouse motion
+                if event.type == pygame.MOUSEMOTION:
+                    continue
+                
+                # Any other event (input, window exposure) may change what is shown
+                self.dirty = True
+                
+                # A previous event may have switched screens
+                if self.current_screen != hover_screen:
+                    hover_screen = self.current_screen
+                    self.update_hover(mouse_pos)
                 
                 # Handle button events
                 current_buttons = self.buttons.get(self.current_screen, [])
                 for button in current_buttons:
-                    button.check_hover(mouse_pos)
                     button.handle_event(event)
                 
                 # Handle text input events
-                if self.current_screen == "file_input":
-                    self.filename_input.handle_event(event)
-                    
-                elif self.current_screen == "console_input":
-                    self.temp_input.handle_event(event)
-                
-                elif self.current_screen == "string_input":
-                    self.test_string_input.handle_event(event)
+                text_box = self.current_text_box()
+                if text_box is not None:
+                    text_box.handle_event(event)
             
-            # Draw everything
-            self.draw()
+            if self.current_screen != hover_screen:
+                self.update_hover(mouse_pos)
             
-            # Cap the frame rate
-            clock.tick(60)
+            # Repaint the whole screen only when something changed; a pure
+            # cursor blink only repaints the active text box
+            if self.dirty:
+                self.draw()
+                self.dirty = False
+            else:
+                text_box = self.current_text_box()
+                if text_box is not None and text_box.active:
+                    text_box.draw(screen)
+                    pygame.display.update(text_box.rect)
         
         pygame.quit()
         sys.exit()